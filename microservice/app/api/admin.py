@@ -1,26 +1,81 @@
 """Admin API routes for monitoring and statistics."""
 from fastapi import APIRouter, Depends, Request
-from typing import Dict, Any, List
-from datetime import datetime, timedelta, timezone
+from typing import Dict, Any, List, Deque, Tuple
+from collections import defaultdict, deque
+from datetime import datetime, timezone
+import array
+import asyncio
+import itertools
+import logging
 import psutil
+import time
 import os
 
 from ..core.auth import require_admin
+from ..core.config import settings
 from ..services.converter import WorkerPool
 
 
+logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/api/admin", tags=["admin"])
 
 
-# In-memory stats storage (in production, use Redis or a database)
-conversion_stats = {
-    "total_requests": 0,
-    "successful_conversions": 0,
-    "failed_conversions": 0,
-    "conversions_by_type": {},
-    "recent_conversions": [],
-    "hourly_requests": {},
-}
+# Conversion counters. Stats are only written from the event loop, so plain
+# module-level values need no locking.
+total_requests = 0
+successful_conversions = 0
+failed_conversions = 0
+conversions_by_type: Dict[str, int] = defaultdict(int)
+
+# Running totals for the average successful conversion time
+duration_sum = 0.0
+duration_count = 0
+
+# Most recent conversions, newest first; the deque drops the oldest entry itself
+MAX_RECENT_CONVERSIONS = 100
+recent_conversions: Deque[Dict[str, Any]] = deque(maxlen=MAX_RECENT_CONVERSIONS)
+
+# Requests per hour over the last day, as a ring buffer indexed by epoch hour
+HISTORY_HOURS = 24
+hourly_requests = array.array("Q", [0] * HISTORY_HOURS)
+_last_hour = int(time.time() // 3600)
+
+# Chart labels for the hour they were built for; they only change hourly
+_hour_labels: Tuple[int, List[str]] = (-1, [])
+
+# Process ID reported for workers, refreshed if the app is forked after import
+_PID = os.getpid()
+
+
+def _refresh_pid() -> None:
+    """Update the cached PID in a forked child process."""
+    global _PID
+    _PID = os.getpid()
+
+
+os.register_at_fork(after_in_child=_refresh_pid)
+
+
+def _history_labels(current_hour: int) -> List[str]:
+    """Return the chart labels ending at ``current_hour``, rebuilt once per hour."""
+    global _hour_labels
+    if _hour_labels[0] != current_hour:
+        _hour_labels = (current_hour, [
+            f"{hour % HISTORY_HOURS:02d}:00"
+            for hour in range(current_hour - HISTORY_HOURS + 1, current_hour + 1)
+        ])
+    return _hour_labels[1]
+
+
+def _advance_hourly_requests(hour: int) -> None:
+    """Move the hourly ring buffer forward to ``hour``, zeroing skipped slots."""
+    global _last_hour
+    elapsed = hour - _last_hour
+    if elapsed <= 0:
+        return
+    for skipped in range(_last_hour + 1, _last_hour + 1 + min(elapsed, HISTORY_HOURS)):
+        hourly_requests[skipped % HISTORY_HOURS] = 0
+    _last_hour = hour
 
 
 def update_conversion_stats(
@@ -31,39 +86,81 @@ def update_conversion_stats(
     status: str
 ):
     """Update conversion statistics."""
-    conversion_stats["total_requests"] += 1
+    global total_requests, successful_conversions, failed_conversions
+    global duration_sum, duration_count
+    total_requests += 1
     
     if status == "success":
-        conversion_stats["successful_conversions"] += 1
+        successful_conversions += 1
+        if duration > 0:
+            duration_sum += duration
+            duration_count += 1
     else:
-        conversion_stats["failed_conversions"] += 1
+        failed_conversions += 1
     
     # Track by file type
-    if file_type not in conversion_stats["conversions_by_type"]:
-        conversion_stats["conversions_by_type"][file_type] = 0
-    conversion_stats["conversions_by_type"][file_type] += 1
+    conversions_by_type[file_type] += 1
     
-    # Track hourly
-    current_hour = datetime.now(timezone.utc).strftime("%Y-%m-%d %H:00")
-    if current_hour not in conversion_stats["hourly_requests"]:
-        conversion_stats["hourly_requests"][current_hour] = 0
-    conversion_stats["hourly_requests"][current_hour] += 1
+    # Track hourly, deriving both the bucket and the timestamp from one clock read
+    now = datetime.now(timezone.utc)
+    current_hour = int(now.timestamp()) // 3600
+    _advance_hourly_requests(current_hour)
+    hourly_requests[current_hour % HISTORY_HOURS] += 1
     
     # Add to recent conversions
-    conversion_stats["recent_conversions"].insert(0, {
-        "timestamp": datetime.now(timezone.utc).isoformat(),
+    recent_conversions.appendleft({
+        "timestamp": now.isoformat(),
         "filename": filename,
         "file_type": file_type,
         "file_size": file_size,
         "duration": round(duration, 2),
         "status": status
     })
+
+
+async def sample_system_stats(state) -> None:
+    """
+    Periodically sample system usage into ``state.cpu_percent`` and ``state.memory``.
+
+    psutil reports CPU usage relative to the previous call, so sampling on a
+    fixed interval keeps /stats from blocking the event loop to measure it,
+    and from re-reading /proc/meminfo on every request.
+    """
+    failing = False
+    while True:
+        try:
+            # The first call only primes the baseline and reports 0.0
+            state.cpu_percent = psutil.cpu_percent(interval=None)
+            state.memory = psutil.virtual_memory()
+            failing = False
+        except Exception:
+            # Keep sampling; log the first failure in full, repeats quietly
+            logger.log(
+                logging.DEBUG if failing else logging.WARNING,
+                "Failed to sample system stats",
+                exc_info=True
+            )
+            failing = True
+        await asyncio.sleep(settings.SYSTEM_STATS_INTERVAL)
+
+
+async def record_conversion_stats(
+    filename: str,
+    file_type: str,
+    file_size: int,
+    duration: float,
+    status: str
+):
+    """
+    Update conversion statistics from a response background task.
     
-    # Keep only last 100 conversions
-    conversion_stats["recent_conversions"] = conversion_stats["recent_conversions"][:100]
+    Declared as a coroutine so Starlette runs it on the event loop after the
+    response is sent, rather than handing it to the thread pool.
+    """
+    update_conversion_stats(filename, file_type, file_size, duration, status)
 
 
-@router.get("/stats")
+@router.get("/stats", response_model=None)
 async def get_admin_stats(
     request: Request,
     admin_user: Dict[str, Any] = Depends(require_admin)
@@ -72,22 +169,20 @@ async def get_admin_stats(
     # Get worker pool
     worker_pool: WorkerPool = request.app.state.worker_pool
     
+    # Snapshot counters once so the response is internally consistent
+    total = total_requests
+    successful = successful_conversions
+    failed = failed_conversions
+    
     # Calculate success rate
-    total = conversion_stats["total_requests"]
     success_rate = 0
     if total > 0:
-        success_rate = round(
-            (conversion_stats["successful_conversions"] / total) * 100, 1
-        )
+        success_rate = round((successful / total) * 100, 1)
     
-    # Calculate average response time from recent conversions
-    recent_times = [
-        c["duration"] for c in conversion_stats["recent_conversions"]
-        if c["status"] == "success" and c["duration"] > 0
-    ]
+    # Calculate average response time from the running totals
     avg_response_time = 0
-    if recent_times:
-        avg_response_time = round(sum(recent_times) / len(recent_times), 2)
+    if duration_count:
+        avg_response_time = round(duration_sum / duration_count, 2)
     
     # Get worker information
     workers = []
@@ -102,41 +197,37 @@ async def get_admin_stats(
                 workers.append({
                     "id": i + 1,
                     "status": "idle",  # In production, track actual status
-                    "pid": os.getpid(),  # In production, get actual worker PID
-                    "tasks_completed": conversion_stats["successful_conversions"] // num_workers
+                    "pid": _PID,  # In production, get actual worker PID
+                    "tasks_completed": successful // num_workers
                 })
     
-    # Prepare hourly request data for chart
-    now = datetime.now(timezone.utc)
+    # Prepare hourly request data for chart, oldest hour first
+    current_hour = int(time.time() // 3600)
+    _advance_hourly_requests(current_hour)
+    oldest_slot = (current_hour + 1) % HISTORY_HOURS
     request_history = {
-        "labels": [],
-        "data": []
+        "labels": _history_labels(current_hour),
+        "data": hourly_requests[oldest_slot:].tolist() + hourly_requests[:oldest_slot].tolist()
     }
     
-    for i in range(24):
-        hour = now - timedelta(hours=23-i)
-        hour_key = hour.strftime("%Y-%m-%d %H:00")
-        hour_label = hour.strftime("%H:00")
-        
-        request_history["labels"].append(hour_label)
-        request_history["data"].append(
-            conversion_stats["hourly_requests"].get(hour_key, 0)
-        )
-    
     # Get system stats
-    cpu_percent = psutil.cpu_percent(interval=0.1)
-    memory = psutil.virtual_memory()
+    # Only the sampler measures CPU: psutil keeps one baseline for
+    # interval-less calls, so measuring here would cut the sampler's window
+    cpu_percent = getattr(request.app.state, "cpu_percent", 0.0)
+    memory = getattr(request.app.state, "memory", None)
+    if memory is None:
+        memory = psutil.virtual_memory()
     
     return {
-        "total_requests": conversion_stats["total_requests"],
-        "successful_conversions": conversion_stats["successful_conversions"],
-        "failed_conversions": conversion_stats["failed_conversions"],
+        "total_requests": total,
+        "successful_conversions": successful,
+        "failed_conversions": failed,
         "success_rate": success_rate,
         "avg_response_time": avg_response_time,
         "active_workers": len(workers),
         "workers": workers,
-        "file_types": conversion_stats["conversions_by_type"],
-        "recent_conversions": conversion_stats["recent_conversions"][:20],
+        "file_types": dict(conversions_by_type),
+        "recent_conversions": list(itertools.islice(recent_conversions, 20)),
         "request_history": request_history,
         "system": {
             "cpu_percent": cpu_percent,
@@ -152,13 +243,15 @@ async def clear_stats(
     admin_user: Dict[str, Any] = Depends(require_admin)
 ) -> Dict[str, str]:
     """Clear all statistics."""
-    global conversion_stats
-    conversion_stats = {
-        "total_requests": 0,
-        "successful_conversions": 0,
-        "failed_conversions": 0,
-        "conversions_by_type": {},
-        "recent_conversions": [],
-        "hourly_requests": {},
-    }
+    global total_requests, successful_conversions, failed_conversions
+    global duration_sum, duration_count
+    total_requests = 0
+    successful_conversions = 0
+    failed_conversions = 0
+    conversions_by_type.clear()
+    duration_sum = 0.0
+    duration_count = 0
+    recent_conversions.clear()
+    for slot in range(HISTORY_HOURS):
+        hourly_requests[slot] = 0
     return {"message": "Statistics cleared successfully"}
\ No newline at end of file
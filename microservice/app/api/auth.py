@@ -1,9 +1,13 @@
 """Authentication API routes."""
 from fastapi import APIRouter, Depends, HTTPException, status
 from pydantic import BaseModel
-from typing import Dict, Any
+from typing import Dict, Any, Tuple
+import hashlib
+import hmac
+import time
 
 from ..core.auth import (
+    SECRET_KEY,
     verify_password, 
     create_access_token, 
     create_refresh_token,
@@ -36,6 +40,33 @@ users_db = {
     }
 }
 
+# Recently verified credentials: username -> (keyed digest, expiry).
+# Repeat logins within the TTL skip the deliberately slow bcrypt check.
+LOGIN_CACHE_TTL_SECONDS = 60
+_verified_logins: Dict[str, Tuple[bytes, float]] = {}
+
+
+def _credentials_digest(username: str, password: str) -> bytes:
+    """Return a keyed digest of the credentials for the login cache."""
+    message = f"{username}\0{password}".encode()
+    return hmac.new(SECRET_KEY.encode(), message, hashlib.sha256).digest()
+
+
+def _authenticate(username: str, password: str, hashed_password: str) -> bool:
+    """Verify a password, using the short-lived login cache when possible."""
+    digest = _credentials_digest(username, password)
+    now = time.monotonic()
+    
+    cached = _verified_logins.get(username)
+    if cached and cached[1] > now and hmac.compare_digest(cached[0], digest):
+        return True
+    
+    if not verify_password(password, hashed_password):
+        return False
+    
+    _verified_logins[username] = (digest, now + LOGIN_CACHE_TTL_SECONDS)
+    return True
+
 
 @router.post("/login", response_model=TokenResponse)
 async def login(credentials: LoginRequest) -> TokenResponse:
@@ -43,7 +74,9 @@ async def login(credentials: LoginRequest) -> TokenResponse:
     # Get user from database
     user = users_db.get(credentials.username)
     
-    if not user or not verify_password(credentials.password, user["hashed_password"]):
+    if not user or not _authenticate(
+        credentials.username, credentials.password, user["hashed_password"]
+    ):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid username or password",
@@ -1,9 +1,11 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException, Request, status, Depends
-from fastapi.responses import JSONResponse
+from fastapi import APIRouter, BackgroundTasks, UploadFile, File, HTTPException, Request, status, Depends
+from fastapi.responses import ORJSONResponse, Response
+from starlette.formparsers import MultiPartParser
 import logging
 import traceback
 from typing import Optional
 import asyncio
+import mmap
 import time
 import os
 
@@ -16,13 +18,16 @@ from ..api.models import (
 )
 from ..core.config import settings
 from ..core.security import validate_file_type, validate_file_size
-from ..services.converter import ConversionService
-from ..api.admin import update_conversion_stats
+from ..services.converter import ConversionService, ConversionError
+from ..api.admin import update_conversion_stats, record_conversion_stats
 
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix=settings.API_PREFIX)
 
+# Immutable for the life of the process
+_APP_VERSION = settings.APP_VERSION
+
 
 # Supported formats mapping
 SUPPORTED_FORMATS = [
@@ -148,6 +153,11 @@ SUPPORTED_FORMATS = [
     )
 ]
 
+# The format list never changes at runtime, so serialize it once
+_SUPPORTED_FORMATS_JSON = SupportedFormatsResponse(
+    formats=SUPPORTED_FORMATS
+).model_dump_json().encode()
+
 
 async def get_conversion_service(request: Request) -> ConversionService:
     """Get conversion service from app state."""
@@ -159,9 +169,14 @@ async def get_conversion_service(request: Request) -> ConversionService:
     return request.app.state.worker_pool.get_conversion_service()
 
 
-@router.post("/convert", response_model=ConversionResponse)
+@router.post(
+    "/convert",
+    response_class=ORJSONResponse,
+    responses={200: {"model": ConversionResponse}}
+)
 async def convert_file(
     request: Request,
+    background_tasks: BackgroundTasks,
     file: UploadFile = File(...),
     keep_data_uris: bool = False,
     file_extension: Optional[str] = None,
@@ -178,20 +193,34 @@ async def convert_file(
     """
     start_time = time.time()
     file_size = 0
+    mapped = None
     
     try:
-        # Read file content
-        file_content = await file.read()
-        file_size = len(file_content)
+        # Reject oversized uploads before reading when the size is known
+        if file.size is not None:
+            validate_file_size(file.size)
         
-        # Validate file size
+        # Uploads Starlette has spooled to disk are mapped read-only rather
+        # than read, so validating, hashing and handing them to process
+        # workers through shared memory needs no heap copy (a thread-mode
+        # executor still copies the content into the converter's stream)
+        mapped = _map_upload(file)
+        if mapped is not None:
+            file_content = mapped
+        else:
+            # Read the content in one call, so only one copy is ever held.
+            # The read is capped one byte past the limit, so an upload of
+            # unknown size is never read in full before being rejected.
+            file_content = await file.read(settings.MAX_FILE_SIZE + 1)
+        file_size = len(file_content)
         validate_file_size(file_size)
         
         # Validate file type
         detected_mimetype, detected_extension = validate_file_type(
             file_content, 
             file.filename,
-            mimetype or file.content_type
+            mimetype or file.content_type,
+            fd=file.file.fileno() if mapped is not None else None
         )
         
         # Use overrides if provided
@@ -235,8 +264,9 @@ async def convert_file(
         # Calculate duration
         duration = (time.time() - start_time) * 1000  # Convert to ms
         
-        # Update statistics
-        update_conversion_stats(
+        # Update statistics after the response has been sent
+        background_tasks.add_task(
+            record_conversion_stats,
             filename=file.filename,
             file_type=final_extension,
             file_size=file_size,
@@ -246,11 +276,10 @@ async def convert_file(
         
         logger.info(f"Conversion successful for file: {file.filename} (took {duration:.2f}ms)")
         
-        return ConversionResponse(
-            markdown=result["markdown"],
-            title=result.get("title"),
-            metadata=result.get("metadata", {})
-        )
+        # orjson serializes the slotted result directly; returning it as a
+        # ConversionResponse would dump, revalidate and reserialize the whole
+        # markdown string before encoding
+        return ORJSONResponse(content=result)
         
     except HTTPException:
         raise
@@ -263,15 +292,36 @@ async def convert_file(
             duration=duration,
             status="error"
         )
-        logger.error(f"Conversion error: {str(e)}", exc_info=True)
+        # Failed conversions are normal flow; only unexpected errors need a traceback
+        logger.error(
+            f"Conversion error: {str(e)}",
+            exc_info=not isinstance(e, ConversionError)
+        )
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Conversion failed: {str(e)}"
         )
     finally:
+        if mapped is not None:
+            try:
+                mapped.close()
+            except BufferError:
+                # A cancelled conversion's thread still reads from it; the
+                # mapping is released once that thread lets go
+                pass
         await file.close()
 
 
+def _map_upload(file: UploadFile) -> Optional[mmap.mmap]:
+    """Map an upload spooled to disk, or return None if it is held in memory."""
+    # The parser spools each file to a SpooledTemporaryFile, which rolls
+    # over to disk once it grows past max_file_size. Smaller uploads stay in
+    # memory, where fileno() would force a needless rollover.
+    if file.size is None or file.size <= MultiPartParser.max_file_size:
+        return None
+    return mmap.mmap(file.file.fileno(), 0, access=mmap.ACCESS_READ)
+
+
 @router.get("/health", response_model=HealthResponse)
 async def health_check(
     request: Request,
@@ -279,30 +329,32 @@ async def health_check(
 ):
     """Check the health status of the service."""
     try:
-        workers_available = conversion_service.get_available_workers()
-        
         return HealthResponse(
             status="healthy",
-            version=settings.APP_VERSION,
-            workers_available=workers_available
+            version=_APP_VERSION,
+            workers_available=conversion_service.workers_available
         )
     except Exception as e:
         logger.error(f"Health check failed: {str(e)}")
-        return JSONResponse(
+        return ORJSONResponse(
             status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
             content={
                 "status": "unhealthy",
-                "version": settings.APP_VERSION,
+                "version": _APP_VERSION,
                 "workers_available": 0,
                 "error": str(e)
             }
         )
 
 
-@router.get("/supported-formats", response_model=SupportedFormatsResponse)
+@router.get(
+    "/supported-formats",
+    response_class=Response,
+    responses={200: {"model": SupportedFormatsResponse}}
+)
 async def get_supported_formats():
     """Get list of supported file formats."""
-    return SupportedFormatsResponse(formats=SUPPORTED_FORMATS)
+    return Response(content=_SUPPORTED_FORMATS_JSON, media_type="application/json")
 
 
 # Note: Exception handlers should be added at the app level in main.py, not on routers
\ No newline at end of file
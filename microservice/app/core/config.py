@@ -1,5 +1,6 @@
 from pydantic_settings import BaseSettings
-from typing import List
+from functools import cached_property
+from typing import FrozenSet, List
 import os
 
 
@@ -11,11 +12,20 @@ class Settings(BaseSettings):
     
     # Worker Settings
     WORKER_COUNT: int = 4
+    USE_PROCESS_POOL: bool = True  # False converts on threads in the web process
+    WORKER_MAX_TASKS_PER_CHILD: int = 0  # Recycle pool processes after this many jobs (0 = never)
     MAX_QUEUE_SIZE: int = 100
+    BATCH_SMALL_FILE_SIZE: int = 64 * 1024  # Files below this are batched per worker dispatch (0 disables)
+    BATCH_MAX_SIZE: int = 8  # Most small files converted in one dispatch
+    BATCH_MAX_DELAY_MS: float = 2.0  # Longest a small file waits for a batch to fill
+    RESULT_CACHE_SIZE: int = 256  # Conversion results kept by content hash (0 disables)
+    RESULT_CACHE_MAX_BYTES: int = 64 * 1024 * 1024  # 64MB of cached markdown
+    PDF_BACKEND: str = "pdfium"  # "pdfium" (pypdfium2, when installed) or "pdfminer"
     
     # Security
     ALLOWED_ORIGINS: str = "*"  # Can be comma-separated list: "http://localhost:3000,https://example.com"
     RATE_LIMIT_PER_MINUTE: int = 60
+    RATE_LIMIT_MAX_IPS: int = 16384  # Client IPs tracked before evicting the least recent
     
     @property
     def allowed_origins_list(self) -> List[str]:
@@ -31,6 +41,9 @@ class Settings(BaseSettings):
     # Logging
     LOG_LEVEL: str = "INFO"
     
+    # Monitoring
+    SYSTEM_STATS_INTERVAL: float = 2.0  # Seconds between CPU samples for /stats
+    
     # Supported file extensions and mimetypes
     SUPPORTED_EXTENSIONS: List[str] = [
         ".pdf", ".docx", ".doc", ".pptx", ".ppt", 
@@ -41,6 +54,11 @@ class Settings(BaseSettings):
         ".ipynb", ".zip"
     ]
     
+    @cached_property
+    def supported_extensions_set(self) -> FrozenSet[str]:
+        """Lowercased SUPPORTED_EXTENSIONS as a frozenset for O(1) membership checks."""
+        return frozenset(ext.lower() for ext in self.SUPPORTED_EXTENSIONS)
+    
     # Application metadata
     APP_NAME: str = "MarkItDown Microservice"
     APP_VERSION: str = "1.0.0"
@@ -1,10 +1,16 @@
+import atexit
+import copy
 import logging
+import logging.handlers
+import os
+import queue
 import sys
-from typing import Any, Dict
-import json
-from datetime import datetime
+from typing import Any, Dict, Optional
+from datetime import datetime, timezone
 import traceback
 
+import orjson
+
 
 class StructuredFormatter(logging.Formatter):
     """Custom formatter for structured JSON logging."""
@@ -12,7 +18,7 @@ class StructuredFormatter(logging.Formatter):
     def format(self, record: logging.LogRecord) -> str:
         """Format log record as JSON."""
         log_data = {
-            "timestamp": datetime.utcnow().isoformat(),
+            "timestamp": datetime.now(timezone.utc),
             "level": record.levelname,
             "logger": record.name,
             "message": record.getMessage(),
@@ -29,13 +35,75 @@ class StructuredFormatter(logging.Formatter):
         
         # Add exception info if present
         if record.exc_info:
+            exc_type, exc_value, exc_tb = record.exc_info
             log_data["exception"] = {
-                "type": record.exc_info[0].__name__,
-                "message": str(record.exc_info[1]),
-                "traceback": traceback.format_exception(*record.exc_info)
+                "type": exc_type.__name__,
+                "message": str(exc_value),
+                # Frame summary only; type and message are captured above
+                "traceback": traceback.extract_tb(exc_tb).format()
             }
         
-        return json.dumps(log_data)
+        return orjson.dumps(log_data, default=str, option=orjson.OPT_UTC_Z).decode()
+
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """
+    Queue handler that leaves all formatting to the listener thread.
+
+    The stock QueueHandler formats the record (including any traceback) in
+    the calling thread. Here only the message is resolved, so the caller
+    just enqueues and the StructuredFormatter runs on the listener thread.
+    """
+    
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        """Snapshot the message; keep exc_info for the formatter."""
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+
+# Background listener that writes queued records to stdout, and the process
+# it runs in; forked children inherit the queue handler but not the thread
+_listener: Optional[logging.handlers.QueueListener] = None
+_listener_pid: Optional[int] = None
+
+
+def stop_logging() -> None:
+    """Flush queued log records and stop the background listener."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+atexit.register(stop_logging)
+
+
+def setup_worker_logging() -> None:
+    """
+    Write a forked worker's log records straight to stdout.
+    
+    Nothing drains the inherited queue in a child process, so records queued
+    there would be lost and pile up in memory. No-op in the process that runs
+    the listener, and where logging was never set up.
+    """
+    global _listener
+    if _listener is None or _listener_pid == os.getpid():
+        return
+    
+    root_logger = logging.getLogger()
+    for handler in root_logger.handlers[:]:
+        if isinstance(handler, DeferredQueueHandler):
+            root_logger.removeHandler(handler)
+    
+    # Same output format as the parent's listener
+    console_handler = logging.StreamHandler(sys.stdout)
+    console_handler.setFormatter(_listener.handlers[0].formatter)
+    root_logger.addHandler(console_handler)
+    
+    # The listener thread doesn't exist here; don't try to stop it at exit
+    _listener = None
 
 
 def setup_logging(log_level: str = "INFO"):
@@ -64,9 +132,19 @@ def setup_logging(log_level: str = "INFO"):
             )
         )
     
+    # Write from a background thread so request handlers only enqueue
+    global _listener, _listener_pid
+    stop_logging()
+    log_queue = queue.SimpleQueue()
+    _listener = logging.handlers.QueueListener(
+        log_queue, console_handler, respect_handler_level=True
+    )
+    _listener.start()
+    _listener_pid = os.getpid()
+    
     # Configure root logger
     root_logger.setLevel(getattr(logging, log_level.upper()))
-    root_logger.addHandler(console_handler)
+    root_logger.addHandler(DeferredQueueHandler(log_queue))
     
     # Configure specific loggers
     # Reduce noise from libraries
@@ -1,35 +1,108 @@
 from fastapi import HTTPException, Request, status
-from fastapi.responses import JSONResponse
+from fastapi.responses import ORJSONResponse, RedirectResponse, Response
 from starlette.middleware.base import BaseHTTPMiddleware
-from typing import Callable
+from typing import Callable, List, Optional, Tuple
+import os
+import secrets
+import sys
 import time
 import logging
-from collections import defaultdict
-from datetime import datetime, timedelta
+from collections import OrderedDict
 import magic
-import mimetypes
 from ..core.config import settings
 
 
 logger = logging.getLogger(__name__)
 
+# libmagic loads and compiles its rule database when a handle is opened, so
+# share one handle; Magic.from_buffer serializes access with its own lock
+_MAGIC = magic.Magic(mime=True)
+
+# libmagic identifies most formats from the head of the file. Generic
+# container results (e.g. OLE storage for .xls/.msg, plain ZIP for some
+# .pptx) need the whole buffer to be resolved to the specific format.
+MIME_SNIFF_BYTES = 4096
+_CONTAINER_MIMETYPES = frozenset({
+    "application/octet-stream",
+    "application/x-ole-storage",
+    "application/zip",
+})
+
+# Rate-limit buckets are split across this many independent LRU maps (a
+# power of two, so the shard index is a mask of the IP's hash)
+RATE_LIMIT_SHARDS = 16
+
+# Health probes are hit every few seconds by monitoring, so they bypass
+# request IDs, rate limiting, auth and header decoration entirely
+_FAST_PATHS = frozenset({"/health", f"{settings.API_PREFIX}/health"})
+
+# Path prefixes that require an Authorization header
+_PROTECTED_PREFIXES = ("/docs", "/redoc", "/openapi.json", "/admin")
+
+# MIME types accepted by validate_file_type (any text/* is also allowed)
+_SUPPORTED_MIMETYPES = frozenset({
+    "application/pdf",
+    "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+    "application/msword",
+    "application/vnd.openxmlformats-officedocument.presentationml.presentation",
+    "application/vnd.ms-powerpoint",
+    "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    "application/vnd.ms-excel",
+    "text/csv",
+    "text/html",
+    "application/epub+zip",
+    "application/vnd.ms-outlook",
+    "audio/mpeg",
+    "audio/mp4",
+    "audio/wav",
+    "image/jpeg",
+    "image/png",
+    "image/gif",
+    "image/bmp",
+    "application/rss+xml",
+    "text/xml",
+    "text/plain",
+    "text/markdown",
+    "application/json",
+    "application/x-ipynb+json",
+    "application/zip",
+    "application/x-zip-compressed",
+})
+
 
 class SecurityMiddleware(BaseHTTPMiddleware):
-    """Security middleware for request validation and rate limiting."""
+    """Security middleware for request IDs, rate limiting and authentication."""
     
     def __init__(self, app):
         super().__init__(app)
-        self.rate_limit_storage = defaultdict(list)
-        self.cleanup_interval = 60  # Clean up old entries every minute
-        self.last_cleanup = time.time()
+        # Token bucket per client IP: [tokens, last_refill] with a burst of one
+        # minute's allowance, refilled continuously at the per-minute rate
+        self.rate_limit_capacity = float(settings.RATE_LIMIT_PER_MINUTE)
+        self.rate_limit_refill_rate = settings.RATE_LIMIT_PER_MINUTE / 60.0  # tokens/second
+        # Kept in least-recently-seen order and capped, so memory stays bounded
+        # under traffic from many distinct IPs. Sharding by IP keeps each map
+        # small, so LRU reordering and eviction of one client never touch the
+        # buckets of unrelated ones.
+        self.rate_limit_shards: Tuple["OrderedDict[str, List[float]]", ...] = tuple(
+            OrderedDict() for _ in range(RATE_LIMIT_SHARDS)
+        )
+        self.rate_limit_max_ips_per_shard = max(1, -(-settings.RATE_LIMIT_MAX_IPS // RATE_LIMIT_SHARDS))
+        # An idle bucket is full again after this long and can be forgotten
+        self.rate_limit_window = 60.0
     
     async def dispatch(self, request: Request, call_next: Callable):
-        # Add security headers
-        start_time = time.time()
+        if request.url.path in _FAST_PATHS:
+            return await call_next(request)
+        
+        start_time = time.perf_counter()
+        
+        # Add unique request ID for tracking
+        request_id = secrets.token_hex(16)
+        request.state.request_id = request_id
         
-        # Check rate limiting
+        # Check rate limiting, then authentication for protected routes
         if not await self.check_rate_limit(request):
-            return JSONResponse(
+            response = ORJSONResponse(
                 status_code=status.HTTP_429_TOO_MANY_REQUESTS,
                 content={
                     "detail": "Rate limit exceeded",
@@ -37,9 +110,11 @@ class SecurityMiddleware(BaseHTTPMiddleware):
                     "status_code": 429
                 }
             )
-        
-        # Process request
-        response = await call_next(request)
+        else:
+            response = self.check_auth(request)
+            if response is None:
+                # Process request
+                response = await call_next(request)
         
         # Add security headers
         response.headers["X-Content-Type-Options"] = "nosniff"
@@ -63,64 +138,89 @@ class SecurityMiddleware(BaseHTTPMiddleware):
             response.headers["Content-Security-Policy"] = "default-src 'self'"
         
         # Add request timing
-        process_time = time.time() - start_time
+        process_time = time.perf_counter() - start_time
         response.headers["X-Process-Time"] = str(process_time)
+        response.headers["X-Request-ID"] = request_id
         
         return response
     
+    def check_auth(self, request: Request) -> Optional[Response]:
+        """Return an error response if a protected route lacks credentials."""
+        path = request.url.path
+        if not path.startswith(_PROTECTED_PREFIXES):
+            return None
+        
+        # Token validation itself happens in the route dependencies
+        if request.headers.get("Authorization"):
+            return None
+        
+        # For browser requests, redirect to login
+        if request.headers.get("accept", "").startswith("text/html"):
+            return RedirectResponse(url=f"/login?redirect={path}", status_code=status.HTTP_302_FOUND)
+        
+        return ORJSONResponse(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            content={"detail": "Not authenticated"},
+            headers={"WWW-Authenticate": "Bearer"}
+        )
+    
     async def check_rate_limit(self, request: Request) -> bool:
         """Check if request exceeds rate limit."""
-        # Skip rate limiting for health check
-        if request.url.path == "/health":
-            return True
+        now = time.monotonic()
         
-        # Clean up old entries periodically
-        current_time = time.time()
-        if current_time - self.last_cleanup > self.cleanup_interval:
-            self.cleanup_old_entries()
-            self.last_cleanup = current_time
+        # Get client IP (the ASGI scope may not include one, e.g. on Unix sockets)
+        client_ip = request.client.host if request.client else "unknown"
         
-        # Get client IP
-        client_ip = request.client.host
+        # No await below, so the bucket update is atomic on the event loop
+        # and the shard needs no lock
+        storage = self.rate_limit_shards[hash(client_ip) & (RATE_LIMIT_SHARDS - 1)]
         
-        # Get current timestamp
-        now = datetime.now()
-        minute_ago = now - timedelta(minutes=1)
+        # Lazily forget the least recently seen client once its bucket has
+        # refilled; one check per request keeps eviction O(1) with no sweeps
+        if storage:
+            oldest_ip, oldest_bucket = next(iter(storage.items()))
+            if now - oldest_bucket[1] > self.rate_limit_window:
+                del storage[oldest_ip]
         
-        # Filter requests within the last minute
-        recent_requests = [
-            req_time for req_time in self.rate_limit_storage[client_ip]
-            if req_time > minute_ago
-        ]
+        bucket = storage.get(client_ip)
+        if bucket is None:
+            if len(storage) >= self.rate_limit_max_ips_per_shard:
+                # Evict the least recently seen client
+                storage.popitem(last=False)
+            bucket = storage[client_ip] = [self.rate_limit_capacity, now]
+        else:
+            storage.move_to_end(client_ip)
         
-        # Update storage with filtered list
-        self.rate_limit_storage[client_ip] = recent_requests
+        # Refill the bucket for the time elapsed since the last request
+        bucket[0] = min(
+            self.rate_limit_capacity,
+            bucket[0] + (now - bucket[1]) * self.rate_limit_refill_rate
+        )
+        bucket[1] = now
         
         # Check rate limit
-        if len(recent_requests) >= settings.RATE_LIMIT_PER_MINUTE:
+        if bucket[0] < 1:
             logger.warning(f"Rate limit exceeded for IP: {client_ip}")
             return False
         
-        # Add current request
-        self.rate_limit_storage[client_ip].append(now)
+        # Consume a token for the current request
+        bucket[0] -= 1
         return True
-    
-    def cleanup_old_entries(self):
-        """Remove old entries from rate limit storage."""
-        cutoff_time = datetime.now() - timedelta(minutes=2)
-        for ip in list(self.rate_limit_storage.keys()):
-            self.rate_limit_storage[ip] = [
-                req_time for req_time in self.rate_limit_storage[ip]
-                if req_time > cutoff_time
-            ]
-            if not self.rate_limit_storage[ip]:
-                del self.rate_limit_storage[ip]
 
 
-def validate_file_type(file_content: bytes, filename: str, provided_mimetype: str = None) -> tuple[str, str]:
+def validate_file_type(
+    file_content: bytes,
+    filename: str,
+    provided_mimetype: str = None,
+    fd: Optional[int] = None
+) -> tuple[str, str]:
     """
     Validate file type using magic numbers and extension.
     
+    file_content may be a read-only mapping of the upload; python-magic only
+    accepts bytes, so pass the mapped file's descriptor as fd and container
+    formats are re-sniffed from it instead of from a full copy.
+    
     Returns:
         tuple: (detected_mimetype, file_extension)
     
@@ -129,8 +229,14 @@ def validate_file_type(file_content: bytes, filename: str, provided_mimetype: st
     """
     # Detect MIME type using python-magic
     try:
-        mime = magic.Magic(mime=True)
-        detected_mimetype = mime.from_buffer(file_content)
+        detected_mimetype = _MAGIC.from_buffer(file_content[:MIME_SNIFF_BYTES])
+        if detected_mimetype in _CONTAINER_MIMETYPES and len(file_content) > MIME_SNIFF_BYTES:
+            if fd is not None:
+                # libmagic reads from the descriptor's current offset
+                os.lseek(fd, 0, os.SEEK_SET)
+                detected_mimetype = _MAGIC.from_descriptor(fd)
+            else:
+                detected_mimetype = _MAGIC.from_buffer(file_content)
     except Exception as e:
         logger.error(f"Error detecting MIME type: {e}")
         detected_mimetype = None
@@ -138,58 +244,37 @@ def validate_file_type(file_content: bytes, filename: str, provided_mimetype: st
     # Get file extension
     file_extension = None
     if filename:
-        parts = filename.lower().split('.')
-        if len(parts) > 1:
-            file_extension = f".{parts[-1]}"
+        ext = os.path.splitext(filename)[1]
+        if ext:
+            file_extension = ext.lower()
     
     # Use provided mimetype if detection failed
     if not detected_mimetype and provided_mimetype:
         detected_mimetype = provided_mimetype
     
     # Validate against supported extensions
-    if file_extension and file_extension not in settings.SUPPORTED_EXTENSIONS:
+    if file_extension and file_extension not in settings.supported_extensions_set:
         raise HTTPException(
             status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
             detail=f"File type '{file_extension}' is not supported"
         )
     
-    # Additional MIME type validation
-    supported_mimetypes = {
-        "application/pdf",
-        "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
-        "application/msword",
-        "application/vnd.openxmlformats-officedocument.presentationml.presentation",
-        "application/vnd.ms-powerpoint",
-        "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        "application/vnd.ms-excel",
-        "text/csv",
-        "text/html",
-        "application/epub+zip",
-        "application/vnd.ms-outlook",
-        "audio/mpeg",
-        "audio/mp4",
-        "audio/wav",
-        "image/jpeg",
-        "image/png",
-        "image/gif",
-        "image/bmp",
-        "application/rss+xml",
-        "text/xml",
-        "text/plain",
-        "text/markdown",
-        "application/json",
-        "application/x-ipynb+json",
-        "application/zip",
-        "application/x-zip-compressed"
-    }
+    # Additional MIME type validation; any text file is accepted whatever its encoding
+    if detected_mimetype and not (
+        detected_mimetype in _SUPPORTED_MIMETYPES or detected_mimetype.startswith("text/")
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            detail=f"MIME type '{detected_mimetype}' is not supported"
+        )
     
-    if detected_mimetype and detected_mimetype not in supported_mimetypes:
-        # Check if it's a text file with different encoding
-        if not detected_mimetype.startswith("text/"):
-            raise HTTPException(
-                status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
-                detail=f"MIME type '{detected_mimetype}' is not supported"
-            )
+    # These values are kept in stats and result cache keys; share one string
+    # per supported type. Only members of the fixed supported sets are
+    # interned, never arbitrary client input.
+    if file_extension:
+        file_extension = sys.intern(file_extension)
+    if detected_mimetype in _SUPPORTED_MIMETYPES:
+        detected_mimetype = sys.intern(detected_mimetype)
     
     return detected_mimetype, file_extension
 
@@ -1,13 +1,13 @@
 from fastapi import FastAPI, Request, Depends, status
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.trustedhost import TrustedHostMiddleware
-from fastapi.responses import JSONResponse, HTMLResponse, RedirectResponse
+from fastapi.responses import HTMLResponse, RedirectResponse, ORJSONResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
-from contextlib import asynccontextmanager
+from contextlib import asynccontextmanager, suppress
+import asyncio
 import uvicorn
 import logging
-import uuid
 import os
 
 from .api import routes, auth as auth_routes, admin as admin_routes
@@ -36,10 +36,16 @@ async def lifespan(app: FastAPI):
     await app.state.worker_pool.start()
     logger.info("Worker pool initialized")
     
+    # Sample system stats in the background for the admin dashboard
+    system_stats_task = asyncio.create_task(admin_routes.sample_system_stats(app.state))
+    
     yield
     
     # Shutdown
     logger.info("Shutting down MarkItDown Microservice...")
+    system_stats_task.cancel()
+    with suppress(asyncio.CancelledError):
+        await system_stats_task
     await app.state.worker_pool.shutdown()
     logger.info("Worker pool shutdown complete")
 
@@ -52,6 +58,7 @@ app = FastAPI(
     docs_url="/docs",
     redoc_url="/redoc",
     openapi_url="/openapi.json",
+    default_response_class=ORJSONResponse,
     lifespan=lifespan
 )
 
@@ -74,20 +81,6 @@ app.add_middleware(
 #     allowed_hosts=["example.com", "*.example.com"]
 # )
 
-# Request ID middleware
-@app.middleware("http")
-async def add_request_id(request: Request, call_next):
-    """Add unique request ID for tracking."""
-    request_id = str(uuid.uuid4())
-    request.state.request_id = request_id
-    
-    # Process the request
-    response = await call_next(request)
-    
-    # Add request ID to response headers
-    response.headers["X-Request-ID"] = request_id
-    return response
-
 # Mount static files
 static_dir = os.path.join(os.path.dirname(__file__), "static")
 if os.path.exists(static_dir):
@@ -98,37 +91,6 @@ app.include_router(routes.router)
 app.include_router(auth_routes.router)
 app.include_router(admin_routes.router)
 
-# Authentication middleware for specific routes
-@app.middleware("http")
-async def auth_middleware(request: Request, call_next):
-    """Check authentication for protected routes."""
-    path = request.url.path
-    
-    # Protected routes that require authentication
-    protected_routes = ["/docs", "/redoc", "/openapi.json", "/admin"]
-    
-    # Check if route needs protection
-    needs_auth = any(path.startswith(route) for route in protected_routes)
-    
-    if needs_auth and path not in ["/login", "/api/auth/login"]:
-        # Check for auth header
-        auth_header = request.headers.get("Authorization")
-        
-        # For browser requests, redirect to login
-        if not auth_header and request.headers.get("accept", "").startswith("text/html"):
-            return RedirectResponse(url=f"/login?redirect={path}", status_code=status.HTTP_302_FOUND)
-        
-        # For API requests, check auth
-        if not auth_header:
-            return JSONResponse(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                content={"detail": "Not authenticated"},
-                headers={"WWW-Authenticate": "Bearer"}
-            )
-    
-    response = await call_next(request)
-    return response
-
 # HTML Routes
 @app.get("/login", response_class=HTMLResponse)
 async def login_page(request: Request):
@@ -166,7 +128,7 @@ async def root():
 async def global_exception_handler(request: Request, exc: Exception):
     """Handle unhandled exceptions."""
     logger.error(f"Unhandled exception: {str(exc)}", exc_info=True)
-    return JSONResponse(
+    return ORJSONResponse(
         status_code=500,
         content={
             "detail": "Internal server error",
@@ -184,5 +146,9 @@ if __name__ == "__main__":
         host="0.0.0.0",
         port=8000,
         reload=True,
+        # Both ship with uvicorn[standard]; pin them so a missing install
+        # fails loudly instead of silently falling back to asyncio/h11
+        loop="uvloop",
+        http="httptools",
         log_level=config.settings.LOG_LEVEL.lower()
     )
\ No newline at end of file
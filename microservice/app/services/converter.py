@@ -1,15 +1,22 @@
 import asyncio
-from concurrent.futures import ProcessPoolExecutor
-from typing import Optional, Dict, Any
+from collections import OrderedDict
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field
+from multiprocessing import resource_tracker, shared_memory
+from typing import Optional, Dict, Any, Callable, List, Tuple, Union
+import copy
+import hashlib
 import io
 import logging
+import mmap
 import sys
 import os
 import re
+import threading
 
 # Try different import methods for markitdown
 try:
-    from markitdown import MarkItDown
+    from markitdown import DocumentConverter, DocumentConverterResult, MarkItDown
 except ImportError:
     # If markitdown is not in the standard path, try adding it
     import site
@@ -19,102 +26,637 @@ except ImportError:
             sys.path.insert(0, sp)
             break
     try:
-        from markitdown import MarkItDown
+        from markitdown import DocumentConverter, DocumentConverterResult, MarkItDown
     except ImportError as e:
         raise ImportError(f"Could not import markitdown. Make sure it's installed. Error: {e}")
 
+# pypdfium2 is optional; it extracts PDF text in PDFium's C code, with the
+# GIL released, where markitdown's default pdfminer.six is pure Python
+try:
+    import pypdfium2
+except ImportError:
+    pypdfium2 = None
+
+# blake3 is optional; it hashes several times faster than hashlib's blake2b
+try:
+    from blake3 import blake3
+except ImportError:
+    blake3 = None
+
 from ..core.config import settings
+from ..core.logging import setup_worker_logging
 
 
 logger = logging.getLogger(__name__)
 
+# Small text-like files convert in microseconds of pure Python, less than
+# the cost of shipping them to a worker process, so they run on threads
+THREAD_FAST_PATH_EXTENSIONS = frozenset({".txt", ".md", ".html", ".csv", ".json"})
+THREAD_FAST_PATH_MAX_SIZE = 1024 * 1024  # 1MB
+
+# Uploads at least this large are handed to pool workers through shared
+# memory instead of being pickled through the executor's pipe
+SHARED_MEMORY_MIN_SIZE = 1024 * 1024  # 1MB
+
+# Content up to this size is hashed for the result cache on the event loop;
+# larger uploads are hashed on a thread (hashlib releases the GIL)
+CACHE_KEY_INLINE_MAX_SIZE = 1024 * 1024  # 1MB
+
+# Patterns used by _clean_markdown, compiled once at import. google-re2 was
+# measured 3-30x slower than re on these substitutions (the binding
+# re-encodes the text on every call).
+# A bullet is matched from the newline before it rather than with ^ and
+# MULTILINE: a literal first character lets re skip ahead to candidate
+# positions instead of attempting a match at every one, which halves the
+# pass on large documents. The first line, with no newline before it, is
+# handled with a match at position 0. A bare \s would also match newlines
+# and pull the preceding blank line into the bullet, so whitespace around
+# the bullet is limited to the same line.
+_RE_BULLET = re.compile(r'\n[^\S\n]*[•·][^\S\n]+')
+_RE_BULLET_FIRST = re.compile(r'[^\S\n]*[•·][^\S\n]+')
+_RE_CODE_OPEN = re.compile(r'```(\w*)\n\n')
+_RE_CODE_CLOSE = re.compile(r'\n\n```')
+
+
+# Uploaded content as accepted by ConversionService. bytes is the cheapest:
+# io.BytesIO shares a bytes buffer instead of copying it.
+BytesLike = Union[bytes, bytearray, memoryview, mmap.mmap]
+
+
+class ConversionError(RuntimeError):
+    """Raised when MarkItDown fails to convert a document."""
+
+
+@dataclass(slots=True, frozen=True)
+class ConversionResult:
+    """
+    Markdown and metadata produced by one conversion.
+    
+    Slots keep each result smaller than the equivalent dict. New code should
+    use attributes (result.markdown); item access (result["markdown"],
+    result.get("title")) remains for callers written against the dict results
+    convert_async used to return.
+    
+    The convert route hands results straight to orjson, so fields (including
+    metadata values) must hold JSON types only: str, int, float, bool, None,
+    lists and dicts with str keys.
+    
+    Cache hits return the same instance, so result.metadata must be treated
+    as read-only; item access and as_dict() hand out a copy of it.
+    """
+    markdown: str
+    title: Optional[str] = None
+    metadata: Dict[str, Any] = field(default_factory=dict)
+    
+    def __getitem__(self, key: str) -> Any:
+        if key not in self.__slots__:
+            raise KeyError(key)
+        return self._item(key)
+    
+    def __contains__(self, key: object) -> bool:
+        return key in self.__slots__
+    
+    def get(self, key: str, default: Any = None) -> Any:
+        return self._item(key) if key in self.__slots__ else default
+    
+    def as_dict(self) -> Dict[str, Any]:
+        """Return the result as a plain dict."""
+        return asdict(self)
+    
+    def _item(self, key: str) -> Any:
+        """Return a field for item access, copying the mutable metadata."""
+        value = getattr(self, key)
+        return copy.deepcopy(value) if key == "metadata" else value
+
+
+class ResultCache:
+    """LRU cache of conversion results, bounded by entry count and markdown size."""
+    
+    def __init__(self, max_entries: int, max_bytes: int):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        # key -> (result, size)
+        self._entries: "OrderedDict[tuple, Tuple[ConversionResult, int]]" = OrderedDict()
+    
+    def __len__(self) -> int:
+        return len(self._entries)
+    
+    def get(self, key: tuple) -> Optional[ConversionResult]:
+        """Return the cached result for key, or None."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        self._entries.move_to_end(key)
+        # Results are frozen, so one instance can be shared by every hit
+        return entry[0]
+    
+    def put(self, key: tuple, result: ConversionResult) -> None:
+        """Cache result, evicting least recently used entries to stay in bounds."""
+        size = len(result.markdown)
+        if size > self.max_bytes:
+            return
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self.total_bytes -= old[1]
+        self._entries[key] = (result, size)
+        self.total_bytes += size
+        while len(self._entries) > self.max_entries or self.total_bytes > self.max_bytes:
+            _, (_, evicted_size) = self._entries.popitem(last=False)
+            self.total_bytes -= evicted_size
+    
+    def clear(self) -> None:
+        """Drop all cached results."""
+        self._entries.clear()
+        self.total_bytes = 0
+
 
 class ConversionService:
     """Service for converting files to markdown using MarkItDown."""
     
-    def __init__(self, max_workers: int = None):
+    def __init__(self, max_workers: int = None, use_processes: Optional[bool] = None):
         self.max_workers = max_workers or settings.WORKER_COUNT
+        # Processes give CPU-bound formats (PDF, DOCX, ...) real parallelism;
+        # threads avoid process overhead where that doesn't matter. Threads
+        # only run conversions in parallel while a parser is in C code with
+        # the GIL released, so for a thread pool install pypdfium2 and keep
+        # PDF_BACKEND=pdfium: PDF text extraction then runs alongside the
+        # event loop and other formats (PDFium itself takes one PDF at a
+        # time). pdfminer.six and mammoth (DOCX) are pure Python and hold the
+        # GIL throughout.
+        self.use_processes = settings.USE_PROCESS_POOL if use_processes is None else use_processes
+        # Fast-path threads share this process's GIL, so more of them than
+        # ThreadPoolExecutor's own default of min(32, cpu_count() + 4) only
+        # adds memory and contention
+        self.thread_workers = min(self.max_workers, 32, (os.cpu_count() or 1) + 4)
         self.executor = None
+        self.thread_executor = None
         self._initialized = False
+        # Jobs running on the worker pool (a batch counts once); feeds workers_available
+        self._inflight = 0
+        # Small files are queued here and converted several per dispatch, so
+        # they share one pickle/IPC round trip to the pool
+        self._batch_queue: Optional[asyncio.Queue] = None
+        self._batcher: Optional[asyncio.Task] = None
+        self._batch_tasks = set()
+        # Loop the service was initialized on; the batcher lives on it
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        # Identical uploads are common (retries, re-submitted documents) and
+        # convert to identical results
+        self.result_cache: Optional[ResultCache] = None
+        if settings.RESULT_CACHE_SIZE > 0:
+            self.result_cache = ResultCache(settings.RESULT_CACHE_SIZE, settings.RESULT_CACHE_MAX_BYTES)
     
     async def initialize(self):
-        """Initialize the process pool executor."""
+        """
+        Initialize the executors and start every worker up front.
+        
+        Idempotent: only the first call creates the executors, so one long-lived
+        service can be shared (as the app and the test session do).
+        """
         if not self._initialized:
-            self.executor = ProcessPoolExecutor(max_workers=self.max_workers)
+            self.executor = self._create_executor()
+            pools = [(self.executor, self.max_workers)]
+            # The fast path and batching only save pickling and IPC round
+            # trips to processes; a thread-mode executor runs everything itself
+            if self.use_processes:
+                self.thread_executor = ThreadPoolExecutor(
+                    max_workers=self.thread_workers,
+                    thread_name_prefix="converter"
+                )
+                pools.append((self.thread_executor, self.thread_workers))
             self._initialized = True
+            self._loop = asyncio.get_running_loop()
+            if self.use_processes and settings.BATCH_SMALL_FILE_SIZE > 0:
+                self._batch_queue = asyncio.Queue()
+                self._batcher = asyncio.create_task(self._run_batcher())
+            
+            # Executors only start workers as jobs arrive; fill the pools now
+            # so the first requests don't pay for process start-up and
+            # MarkItDown construction
+            await asyncio.gather(*(
+                self._loop.run_in_executor(executor, _init_worker)
+                for executor, count in pools
+                for _ in range(count)
+            ))
             logger.info(f"ConversionService initialized with {self.max_workers} workers")
     
+    def _create_executor(self) -> Executor:
+        """Create the executor that runs conversions off the fast path."""
+        if not self.use_processes:
+            return ThreadPoolExecutor(
+                max_workers=self.max_workers,
+                thread_name_prefix="converter",
+                initializer=_init_worker
+            )
+        
+        # Workers attaching to shared memory register the segment with their
+        # resource tracker (before Python 3.13). Forked workers only share
+        # the parent's tracker if it is already running; otherwise each one
+        # starts its own, which never sees the parent's unlink and reports
+        # every segment as leaked at exit. Through the shared tracker the
+        # worker's registration is a duplicate of the parent's entry, and
+        # the parent's unlink clears it.
+        resource_tracker.ensure_running()
+        
+        options = {}
+        if settings.WORKER_MAX_TASKS_PER_CHILD > 0:
+            # Replace workers periodically so memory leaked by parsers can't
+            # accumulate; this makes the pool use the spawn start method
+            options["max_tasks_per_child"] = settings.WORKER_MAX_TASKS_PER_CHILD
+        return ProcessPoolExecutor(
+            max_workers=self.max_workers,
+            initializer=_init_worker,
+            **options
+        )
+    
+    async def reset(self):
+        """
+        Drop cached results while keeping the executors and their warm workers.
+        
+        For reusing one service across independent runs, such as tests; the
+        in-flight counter is live state and needs no reset once conversions
+        have finished.
+        """
+        if self.result_cache is not None:
+            self.result_cache.clear()
+    
     async def shutdown(self):
         """Shutdown the process pool executor."""
+        if self._batcher:
+            self._batcher.cancel()
+            self._batcher = None
+            # Fail jobs that never made it into a batch
+            while not self._batch_queue.empty():
+                _, future = self._batch_queue.get_nowait()
+                if not future.done():
+                    future.set_exception(ConversionError("Conversion service is shutting down"))
+            self._batch_queue = None
+        if self.thread_executor:
+            self.thread_executor.shutdown(wait=True)
+            self.thread_executor = None
         if self.executor:
             self.executor.shutdown(wait=True)
             self._initialized = False
+            self._loop = None
             logger.info("ConversionService shutdown complete")
     
     async def convert_async(
         self, 
-        file_content: bytes, 
+        file_content: BytesLike, 
         filename: str,
         keep_data_uris: bool = False,
         file_extension: Optional[str] = None,
         mimetype: Optional[str] = None
-    ) -> Dict[str, Any]:
+    ) -> ConversionResult:
         """
         Convert file content to markdown asynchronously.
         
         Args:
-            file_content: The file content as bytes
+            file_content: The file content as bytes, a C-contiguous buffer or
+                a read-only mmap of the upload; a mapping is read straight
+                from the page cache when hashing it and copying it to workers
             filename: Original filename
             keep_data_uris: Whether to preserve data URIs
             file_extension: Override file extension
             mimetype: Override MIME type
             
         Returns:
-            Dictionary with markdown content and metadata
+            ConversionResult with markdown content and metadata
         """
         if not self._initialized:
             await self.initialize()
         
-        loop = asyncio.get_event_loop()
+        # Normally self._loop; calls from any other loop (e.g. a second test
+        # client) bypass the batcher, which is bound to the initializing one
+        loop = asyncio.get_running_loop()
         
         try:
-            result = await loop.run_in_executor(
-                self.executor,
-                _convert_sync,
+            if isinstance(file_content, memoryview):
+                # Flatten to unsigned bytes so len() counts bytes
+                file_content = file_content.cast('B')
+            
+            cache_key = None
+            if self.result_cache is not None:
+                cache_key = await _result_cache_key(
+                    file_content, filename, keep_data_uris, file_extension, mimetype
+                )
+                cached = self.result_cache.get(cache_key)
+                if cached is not None:
+                    return cached
+            
+            result = await self._dispatch(
+                loop,
                 file_content,
                 filename,
                 keep_data_uris,
                 file_extension,
                 mimetype
             )
+            
+            if cache_key is not None:
+                self.result_cache.put(cache_key, result)
             return result
         except Exception as e:
-            logger.error(f"Conversion error: {str(e)}", exc_info=True)
+            # Conversion failures already carry the worker traceback in their message
+            logger.error(
+                f"Conversion error: {str(e)}",
+                exc_info=not isinstance(e, ConversionError)
+            )
             raise
     
+    async def _dispatch(
+        self,
+        loop: asyncio.AbstractEventLoop,
+        file_content: BytesLike,
+        filename: str,
+        keep_data_uris: bool,
+        file_extension: Optional[str],
+        mimetype: Optional[str]
+    ) -> ConversionResult:
+        """Run one conversion on the executor path suited to the file."""
+        if not self.use_processes:
+            # Threads share memory: no batching, shared memory or pickling
+            return await self._run_on_executor(
+                loop,
+                _convert_sync,
+                file_content,
+                filename,
+                keep_data_uris,
+                file_extension,
+                mimetype
+            )
+        elif _use_thread_fast_path(file_content, filename, file_extension):
+            return await loop.run_in_executor(
+                self.thread_executor,
+                _convert_sync,
+                file_content,
+                filename,
+                keep_data_uris,
+                file_extension,
+                mimetype
+            )
+        elif (
+            self._batcher is not None
+            and loop is self._loop
+            and len(file_content) < settings.BATCH_SMALL_FILE_SIZE
+        ):
+            future = loop.create_future()
+            self._batch_queue.put_nowait((
+                (_picklable(file_content), filename, keep_data_uris, file_extension, mimetype),
+                future
+            ))
+            return await future
+        elif len(file_content) >= SHARED_MEMORY_MIN_SIZE:
+            return await self._convert_shared(
+                loop,
+                file_content,
+                filename,
+                keep_data_uris,
+                file_extension,
+                mimetype
+            )
+        else:
+            return await self._run_on_executor(
+                loop,
+                _convert_sync,
+                _picklable(file_content),
+                filename,
+                keep_data_uris,
+                file_extension,
+                mimetype
+            )
+    
+    async def _run_on_executor(self, loop: asyncio.AbstractEventLoop, func: Callable, *args) -> Any:
+        """Run func on the worker pool, counting it as in flight while it runs."""
+        # Counted on the event loop thread only, so no lock is needed. Fast
+        # path conversions run on their own threads and are not counted; a
+        # batch occupies one worker and is counted once.
+        self._inflight += 1
+        try:
+            return await loop.run_in_executor(self.executor, func, *args)
+        finally:
+            self._inflight -= 1
+    
+    async def convert_many_async(
+        self,
+        items: List[Dict[str, Any]],
+        return_exceptions: bool = False
+    ) -> List[Union[ConversionResult, BaseException]]:
+        """
+        Convert several files concurrently.
+        
+        Args:
+            items: Keyword arguments for convert_async, one dict per file
+            return_exceptions: Return failures in place of results instead
+                of raising the first one
+            
+        Returns:
+            Results in the same order as items
+        """
+        if not self._initialized:
+            await self.initialize()
+        
+        # Submitted together, small files share batcher dispatches and
+        # repeated content is served from the result cache
+        return await asyncio.gather(
+            *(self.convert_async(**item) for item in items),
+            return_exceptions=return_exceptions
+        )
+    
+    async def _convert_shared(
+        self,
+        loop: asyncio.AbstractEventLoop,
+        file_content: BytesLike,
+        *args
+    ) -> ConversionResult:
+        """Convert in the process pool, passing the content via shared memory."""
+        size = len(file_content)
+        shm = shared_memory.SharedMemory(create=True, size=size)
+        try:
+            shm.buf[:size] = file_content
+            return await self._run_on_executor(
+                loop,
+                _convert_shared_sync,
+                shm.name,
+                size,
+                *args
+            )
+        finally:
+            # Unlinking while a cancelled worker still has it mapped is safe;
+            # the segment is freed once the worker closes it
+            shm.close()
+            shm.unlink()
+    
+    async def _run_batcher(self):
+        """Collect queued small files and dispatch them to the pool in batches."""
+        max_delay = settings.BATCH_MAX_DELAY_MS / 1000
+        while True:
+            batch = [await self._batch_queue.get()]
+            self._drain_batch_queue(batch)
+            if len(batch) < settings.BATCH_MAX_SIZE:
+                # Give concurrent requests a moment to join this batch
+                await asyncio.sleep(max_delay)
+                self._drain_batch_queue(batch)
+            task = asyncio.create_task(self._dispatch_batch(batch))
+            self._batch_tasks.add(task)
+            task.add_done_callback(self._batch_tasks.discard)
+    
+    def _drain_batch_queue(self, batch: List[Tuple[tuple, asyncio.Future]]):
+        """Move queued jobs into batch until it is full or the queue is empty."""
+        while len(batch) < settings.BATCH_MAX_SIZE and not self._batch_queue.empty():
+            batch.append(self._batch_queue.get_nowait())
+    
+    async def _dispatch_batch(self, batch: List[Tuple[tuple, asyncio.Future]]):
+        """Convert a batch in one worker call and resolve each job's future."""
+        loop = asyncio.get_running_loop()
+        try:
+            results = await self._run_on_executor(
+                loop,
+                _convert_batch_sync,
+                [job for job, _ in batch]
+            )
+        except Exception as e:
+            # The pool itself failed, e.g. a worker died
+            results = [e] * len(batch)
+        
+        for (_, future), result in zip(batch, results):
+            if future.done():
+                continue
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+    
+    @property
+    def workers_available(self) -> int:
+        """Workers not busy with a conversion, from the in-flight counter."""
+        if not self._initialized:
+            return 0
+        return max(0, self.max_workers - self._inflight)
+    
     def get_available_workers(self) -> int:
         """Get the number of available workers."""
-        if not self._initialized or not self.executor:
-            return 0
-        # This is an approximation - ProcessPoolExecutor doesn't expose queue state
-        return self.max_workers
+        # Derived from our own counter - the executors don't expose queue state
+        return self.workers_available
+
+
+async def _result_cache_key(
+    file_content: BytesLike,
+    filename: str,
+    keep_data_uris: bool,
+    file_extension: Optional[str],
+    mimetype: Optional[str]
+) -> tuple:
+    """Build the result cache key from the content hash and conversion options."""
+    # _convert_sync only reads the filename's extension, to pick a cleaner
+    # when no file_extension is given, so the rest of the name is left out
+    if len(file_content) <= CACHE_KEY_INLINE_MAX_SIZE:
+        digest = _content_digest(file_content)
+    else:
+        digest = await asyncio.to_thread(_content_digest, file_content)
+    name_extension = None if file_extension else os.path.splitext(filename)[1].lower()
+    return (digest, keep_data_uris, file_extension, mimetype, name_extension)
+
+
+def _content_digest(file_content: BytesLike) -> bytes:
+    """Hash file content for the result cache."""
+    if blake3 is not None:
+        return blake3(file_content).digest(16)
+    return hashlib.blake2b(file_content, digest_size=16).digest()
+
+
+def _picklable(file_content: BytesLike) -> Union[bytes, bytearray]:
+    """Return content that can be sent to a pool process; memoryviews and mmaps can't be pickled."""
+    if isinstance(file_content, (bytes, bytearray)):
+        return file_content
+    return bytes(file_content)
+
+
+def _use_thread_fast_path(
+    file_content: BytesLike,
+    filename: str,
+    file_extension: Optional[str]
+) -> bool:
+    """Whether a file is cheap enough to convert on a thread in this process."""
+    if len(file_content) >= THREAD_FAST_PATH_MAX_SIZE:
+        return False
+    extension = file_extension or os.path.splitext(filename or "")[1]
+    return extension.lower() in THREAD_FAST_PATH_EXTENSIONS
+
+
+# MarkItDown instance of the current worker, built once rather than on every
+# conversion. Thread-local rather than shared because converters keep
+# per-call state on themselves (RssConverter stores its kwargs), and the
+# fast path converts on a thread pool in the web process; each pool process
+# has a single worker thread.
+_md_local = threading.local()
+
+
+# PDFium is not thread-safe, even across documents
+_pdfium_lock = threading.Lock()
+
+
+class _PdfiumConverter(DocumentConverter):
+    """Converts PDFs to plain text with PDFium, in place of markitdown's pdfminer converter."""
+    
+    def accepts(self, file_stream, stream_info, **kwargs) -> bool:
+        return (
+            (stream_info.extension or "").lower() == ".pdf"
+            or (stream_info.mimetype or "").lower().startswith(("application/pdf", "application/x-pdf"))
+        )
+    
+    def convert(self, file_stream, stream_info, **kwargs) -> DocumentConverterResult:
+        # Pass bytes so PDFium never calls back into Python to read the stream
+        data = file_stream.read()
+        pages = []
+        with _pdfium_lock:
+            pdf = pypdfium2.PdfDocument(data)
+            try:
+                for page in pdf:
+                    textpage = page.get_textpage()
+                    pages.append(textpage.get_text_range())
+                    textpage.close()
+                    page.close()
+            finally:
+                pdf.close()
+        return DocumentConverterResult(markdown="\n\n".join(pages))
+
+
+def _get_markitdown() -> MarkItDown:
+    """Return this worker's MarkItDown instance, creating it on first use."""
+    markitdown = getattr(_md_local, "instance", None)
+    if markitdown is None:
+        # Plugins are opt-in; keep them off explicitly so a plugin package
+        # installed in the image can't change output or add per-call cost
+        markitdown = _md_local.instance = MarkItDown(enable_plugins=False)
+        if pypdfium2 is not None and settings.PDF_BACKEND == "pdfium":
+            # Registered last, so it is tried before the built-in PdfConverter
+            markitdown.register_converter(_PdfiumConverter())
+    return markitdown
+
+
+def _init_worker() -> None:
+    """Pool initializer and warm-up job: build the MarkItDown converters up front."""
+    # Forked workers can't use the parent's queued logging
+    setup_worker_logging()
+    _get_markitdown()
 
 
 def _convert_sync(
-    file_content: bytes,
+    file_content: BytesLike,
     filename: str,
     keep_data_uris: bool = False,
     file_extension: Optional[str] = None,
     mimetype: Optional[str] = None
-) -> Dict[str, Any]:
+) -> ConversionResult:
     """
     Synchronous conversion function to run in process pool.
     
     This function runs in a separate process, so it needs to be standalone.
     """
     try:
-        # Create MarkItDown instance
-        markitdown = MarkItDown()
+        markitdown = _get_markitdown()
         
         # Create a file-like object from bytes
         stream = io.BytesIO(file_content)
@@ -134,79 +676,184 @@ def _convert_sync(
         result = markitdown.convert_stream(stream, **options)
         
         # Clean and process the markdown
-        cleaned_markdown = _clean_markdown(result.text_content)
+        if not file_extension:
+            file_extension = os.path.splitext(filename)[1]
+        cleaned_markdown = _clean_markdown(result.text_content, file_extension.lower())
         
         # Extract metadata
-        metadata = {}
-        if hasattr(result, 'metadata') and result.metadata:
-            metadata = result.metadata
+        metadata = getattr(result, 'metadata', None) or {}
         
         # Try to extract title if not provided
-        title = None
-        if hasattr(result, 'title'):
-            title = result.title
+        title = getattr(result, 'title', None)
         
         if not title:
-            # Try to extract from first heading
-            title_match = re.match(r'^#\s+(.+)$', cleaned_markdown, re.MULTILINE)
-            if title_match:
-                title = title_match.group(1).strip()
-        
-        return {
-            "markdown": cleaned_markdown,
-            "title": title,
-            "metadata": metadata
-        }
+            # Try to extract from a level-1 heading on the first line
+            first_line = cleaned_markdown.partition('\n')[0]
+            if first_line[1:2].isspace() and first_line.startswith('#'):
+                title = first_line[1:].strip()
+        
+        return ConversionResult(
+            markdown=cleaned_markdown,
+            title=title,
+            metadata=metadata
+        )
         
     except Exception as e:
         # Log error (logging might not work properly in subprocess)
         import traceback
         error_msg = f"Conversion error: {str(e)}\n{traceback.format_exc()}"
-        raise RuntimeError(error_msg)
+        raise ConversionError(error_msg)
 
 
-def _clean_markdown(markdown: str) -> str:
+def _convert_shared_sync(shm_name: str, size: int, *args) -> ConversionResult:
+    """
+    Run _convert_sync on content the parent placed in shared memory.
+    
+    The parent owns the segment and unlinks it; the worker only attaches
+    long enough to copy the content out.
+    """
+    try:
+        shm = _attach_shared_memory(shm_name)
+    except FileNotFoundError as e:
+        raise ConversionError(f"Conversion error: shared content is gone: {e}")
+    try:
+        file_content = bytes(shm.buf[:size])
+    finally:
+        shm.close()
+    return _convert_sync(file_content, *args)
+
+
+def _attach_shared_memory(shm_name: str) -> shared_memory.SharedMemory:
+    """Attach to a segment the parent owns, without tracking it where Python allows."""
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name=shm_name, track=False)
+    # Registered with the parent's resource tracker; see _create_executor
+    return shared_memory.SharedMemory(name=shm_name)
+
+
+def _convert_batch_sync(jobs: List[tuple]) -> List[Union[ConversionResult, ConversionError]]:
+    """
+    Convert several small files in one process pool call.
+    
+    Each job holds the positional arguments of _convert_sync. A failed job
+    yields its ConversionError in place of a result so the rest of the batch
+    is unaffected.
+    """
+    results = []
+    for job in jobs:
+        try:
+            results.append(_convert_sync(*job))
+        except ConversionError as e:
+            results.append(e)
+    return results
+
+
+def _is_heading(line: str) -> bool:
+    """Whether line is an ATX heading: 1-6 '#' then whitespace and text."""
+    if not line.startswith('#'):
+        return False
+    level = len(line) - len(line.lstrip('#'))
+    return level <= 6 and line[level:level + 1].isspace()
+
+
+def _clean_markdown(markdown: str, file_extension: Optional[str] = None) -> str:
     """
     Clean and post-process markdown content.
     
     Args:
         markdown: Raw markdown content
+        file_extension: Source file extension, used to pick a cleaner that
+            skips passes the source format never needs
         
     Returns:
         Cleaned markdown content
     """
     if not markdown:
         return ""
-    
-    # Remove excessive newlines (more than 2 consecutive)
-    markdown = re.sub(r'\n{3,}', '\n\n', markdown)
-    
-    # Remove trailing whitespace from lines
-    lines = markdown.split('\n')
-    lines = [line.rstrip() for line in lines]
-    markdown = '\n'.join(lines)
-    
-    # Ensure proper spacing around headers
-    markdown = re.sub(r'([^\n])\n(#{1,6}\s)', r'\1\n\n\2', markdown)
-    markdown = re.sub(r'(#{1,6}\s.+)\n([^\n])', r'\1\n\n\2', markdown)
-    
-    # Fix common formatting issues
-    # Remove zero-width spaces
-    markdown = markdown.replace('\u200b', '')
-    
-    # Normalize bullet points
-    markdown = re.sub(r'^\s*[•·]\s+', '- ', markdown, flags=re.MULTILINE)
-    
-    # Ensure code blocks are properly formatted
-    markdown = re.sub(r'```(\w*)\n\n', r'```\1\n', markdown)
-    markdown = re.sub(r'\n\n```', r'\n```', markdown)
+    return _CLEANERS.get(file_extension, _clean_generic)(markdown)
+
+
+def _clean_generic(markdown: str) -> str:
+    """Run every cleaning pass; used for formats without a specialized cleaner."""
+    markdown = _clean_lines(markdown)
+    markdown = _normalize_bullets(markdown)
+    markdown = _fix_code_blocks(markdown)
     
     # Remove leading/trailing whitespace
-    markdown = markdown.strip()
+    return markdown.strip()
+
+
+def _clean_passthrough(markdown: str) -> str:
+    """Plain text is returned as written, minus trailing whitespace."""
+    return '\n'.join(line.rstrip() for line in markdown.split('\n')).strip()
+
+
+def _clean_document(markdown: str) -> str:
+    """
+    Clean PDF and DOCX output.
     
+    pdfminer's text and mammoth's HTML never contain fenced code blocks, so
+    the code block pass is skipped.
+    """
+    markdown = _clean_lines(markdown)
+    markdown = _normalize_bullets(markdown)
+    return markdown.strip()
+
+
+def _clean_lines(markdown: str) -> str:
+    """Remove zero-width spaces and trailing whitespace, collapse blank-line runs and space headings."""
+    # Trailing whitespace, blank-line runs and heading spacing are handled in
+    # one pass over the lines, building a single output list instead of a
+    # full-size intermediate string per transform. Plain string methods run
+    # in C; str.translate is no substitute for the zero-width removal, as with
+    # a non-ASCII table it maps every character in Python-level lookups.
+    out = []
+    previous_heading = False
+    for line in markdown.replace('\u200b', '').split('\n'):
+        line = line.rstrip()
+        if not line:
+            # Keep at most one blank line in a row
+            if out and out[-1]:
+                out.append(line)
+            continue
+        heading = _is_heading(line)
+        if out and out[-1] and (heading or previous_heading):
+            # Ensure proper spacing around headers
+            out.append('')
+        out.append(line)
+        previous_heading = heading
+    return '\n'.join(out)
+
+
+# The regex passes below are skipped unless a substring search (a fast C
+# scan) shows they could match
+
+def _normalize_bullets(markdown: str) -> str:
+    """Replace bullet characters at the start of a line with markdown list markers."""
+    if '•' in markdown or '·' in markdown:
+        first = _RE_BULLET_FIRST.match(markdown)
+        if first:
+            markdown = '- ' + markdown[first.end():]
+        markdown = _RE_BULLET.sub('\n- ', markdown)
     return markdown
 
 
+def _fix_code_blocks(markdown: str) -> str:
+    """Remove blank lines just inside code fences."""
+    if '```' in markdown:
+        markdown = _RE_CODE_OPEN.sub(r'```\1\n', markdown)
+        markdown = _RE_CODE_CLOSE.sub(r'\n```', markdown)
+    return markdown
+
+
+# Cleaners by lowercased source extension; others use _clean_generic
+_CLEANERS = {
+    '.txt': _clean_passthrough,
+    '.pdf': _clean_document,
+    '.docx': _clean_document,
+}
+
+
 class WorkerPool:
     """Manager for the conversion worker pool."""
     
@@ -1,9 +1,22 @@
 import pytest
+from fastapi import Request, UploadFile
 from fastapi.testclient import TestClient
+from starlette.formparsers import MultiPartParser
 from app.main import app
 from app.core.config import settings
+from app.core.security import SecurityMiddleware, validate_file_type
+from app.api.admin import sample_system_stats
+from app.api.models import ConversionResponse
+from app.api.routes import _map_upload, get_conversion_service
+from app.services.converter import ConversionResult
+import asyncio
 import io
+import logging
+import mmap
 import os
+import tempfile
+import types
+import zipfile
 
 
 client = TestClient(app)
@@ -158,11 +171,143 @@ def test_convert_html_file():
     assert "test paragraph" in data["markdown"]
 
 
-def test_rate_limiting():
+def _large_zip() -> bytes:
+    """Build a zip archive too large for the parser to keep in memory."""
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as archive:
+        archive.writestr("data.bin", os.urandom(MultiPartParser.max_file_size + 1))
+    return buffer.getvalue()
+
+
+def test_convert_response_matches_model():
+    """Test that the served conversion response is the documented ConversionResponse."""
+    class StaticService:
+        async def convert_async(self, file_content, filename, **kwargs):
+            return ConversionResult(markdown="# Doc", title="Doc", metadata={"pages": 1})
+    
+    app.dependency_overrides[get_conversion_service] = StaticService
+    try:
+        response = client.post(
+            f"{settings.API_PREFIX}/convert",
+            files={"file": ("doc.txt", io.BytesIO(b"Doc"), "text/plain")}
+        )
+    finally:
+        app.dependency_overrides.clear()
+    
+    assert response.status_code == 200
+    data = response.json()
+    assert data.keys() == ConversionResponse.model_fields.keys()
+    assert ConversionResponse.model_validate(data).model_dump() == data
+    
+    operation = app.openapi()["paths"][f"{settings.API_PREFIX}/convert"]["post"]
+    schema = operation["responses"]["200"]["content"]["application/json"]["schema"]
+    assert schema == {"$ref": "#/components/schemas/ConversionResponse"}
+
+
+def test_map_upload_spooled_to_disk():
+    """Test that uploads spooled to disk are mapped and in-memory ones are not."""
+    threshold = MultiPartParser.max_file_size
+    
+    in_memory = tempfile.SpooledTemporaryFile(max_size=threshold)
+    in_memory.write(b"x" * threshold)
+    assert _map_upload(UploadFile(in_memory, size=threshold)) is None
+    in_memory.close()
+    
+    content = b"x" * (threshold + 1)
+    on_disk = tempfile.SpooledTemporaryFile(max_size=threshold)
+    on_disk.write(content)
+    mapped = _map_upload(UploadFile(on_disk, size=len(content)))
+    try:
+        assert mapped[:] == content
+    finally:
+        mapped.close()
+        on_disk.close()
+
+
+def test_convert_maps_large_upload():
+    """Test that a large upload reaches the converter as a mapping of the spooled file."""
+    received = []
+    
+    class RecordingService:
+        async def convert_async(self, file_content, filename, **kwargs):
+            received.append((type(file_content), len(file_content)))
+            return ConversionResult(markdown="", title=None, metadata={})
+    
+    content = _large_zip()
+    app.dependency_overrides[get_conversion_service] = RecordingService
+    try:
+        response = client.post(
+            f"{settings.API_PREFIX}/convert",
+            files={"file": ("large.zip", content, "application/zip")}
+        )
+    finally:
+        app.dependency_overrides.clear()
+    
+    assert response.status_code == 200
+    assert received == [(mmap.mmap, len(content))]
+
+
+def test_validate_file_type_sniffs_descriptor_from_start():
+    """Test that a mapped container is sniffed from the start of its descriptor."""
+    content = _large_zip()
+    with tempfile.TemporaryFile() as upload:
+        # Leaves the descriptor's offset at the end of the file
+        upload.write(content)
+        upload.flush()
+        mapped = mmap.mmap(upload.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            mimetype, extension = validate_file_type(mapped, "large.zip", fd=upload.fileno())
+        finally:
+            mapped.close()
+    
+    assert mimetype == "application/zip"
+    assert extension == ".zip"
+
+
+@pytest.mark.asyncio
+async def test_rate_limiting():
     """Test rate limiting functionality."""
-    # This test would need to be adjusted based on actual rate limit settings
-    # and would require mocking or adjusting the rate limit for testing
-    pass
+    # Use a dedicated middleware instance so the shared client keeps its budget
+    middleware = SecurityMiddleware(app)
+    request = Request({
+        "type": "http",
+        "path": "/",
+        "headers": [],
+        "client": ("203.0.113.1", 12345),
+    })
+    
+    results = [
+        await middleware.check_rate_limit(request)
+        for _ in range(settings.RATE_LIMIT_PER_MINUTE + 1)
+    ]
+    
+    assert all(results[:-1])
+    assert results[-1] is False
+
+
+@pytest.mark.asyncio
+async def test_system_stats_sampler_survives_errors(monkeypatch, caplog):
+    """Test that a failing psutil call is logged once and sampling continues."""
+    calls = []
+    
+    def failing_cpu_percent(interval=None):
+        calls.append(interval)
+        raise OSError("no /proc")
+    
+    monkeypatch.setattr("app.api.admin.psutil.cpu_percent", failing_cpu_percent)
+    monkeypatch.setattr(settings, "SYSTEM_STATS_INTERVAL", 0)
+    
+    with caplog.at_level(logging.DEBUG, logger="app.api.admin"):
+        task = asyncio.create_task(sample_system_stats(types.SimpleNamespace()))
+        while len(calls) < 3:
+            await asyncio.sleep(0)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+    
+    levels = [record.levelno for record in caplog.records if record.name == "app.api.admin"]
+    assert levels[0] == logging.WARNING
+    assert set(levels[1:]) == {logging.DEBUG}
 
 
 def test_cors_headers():
@@ -194,6 +339,18 @@ def test_request_id_header():
     response = client.get("/")
     
     assert "x-request-id" in response.headers
-    # Verify it's a valid UUID format
+    # Verify it's 16 random bytes in hex
     request_id = response.headers["x-request-id"]
-    assert len(request_id) == 36  # Standard UUID length with hyphens
\ No newline at end of file
+    assert len(request_id) == 32
+    int(request_id, 16)
+
+
+def test_protected_route_requires_auth():
+    """Test protected routes reject requests without credentials."""
+    response = client.get("/openapi.json")
+    assert response.status_code == 401
+    assert "x-request-id" in response.headers
+    
+    response = client.get("/docs", headers={"accept": "text/html"}, follow_redirects=False)
+    assert response.status_code == 302
+    assert response.headers["location"] == "/login?redirect=/docs"
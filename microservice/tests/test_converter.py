@@ -1,15 +1,38 @@
 import pytest
 import asyncio
-from app.services.converter import ConversionService, _clean_markdown
+import mmap
+import os
+import subprocess
+import sys
+import textwrap
+from app.services.converter import (
+    ConversionError,
+    ConversionResult,
+    ConversionService,
+    ResultCache,
+    SHARED_MEMORY_MIN_SIZE,
+    THREAD_FAST_PATH_MAX_SIZE,
+    _clean_markdown,
+    _use_thread_fast_path,
+)
 
 
-@pytest.fixture
-async def conversion_service():
-    """Create a conversion service instance."""
+@pytest.fixture(scope="session")
+def session_conversion_service(event_loop):
+    """Create one conversion service, and its worker pools, for the whole session."""
+    # Driven on the session loop directly, so the loop is still open when
+    # the service shuts down
     service = ConversionService(max_workers=2)
-    await service.initialize()
+    event_loop.run_until_complete(service.initialize())
     yield service
-    await service.shutdown()
+    event_loop.run_until_complete(service.shutdown())
+
+
+@pytest.fixture
+async def conversion_service(session_conversion_service):
+    """Provide the session's conversion service with its cached results cleared."""
+    await session_conversion_service.reset()
+    return session_conversion_service
 
 
 @pytest.mark.asyncio
@@ -53,6 +76,281 @@ async def test_convert_with_options(conversion_service):
     assert result["markdown"].strip() == "Test content"
 
 
+@pytest.mark.asyncio
+async def test_convert_concurrent_small_files(conversion_service):
+    """Test that batched small files each get their own result."""
+    contents = [f"Document number {i}".encode() for i in range(10)]
+    
+    # .xml is not on the thread fast path, so these go through the batcher
+    results = await asyncio.gather(*(
+        conversion_service.convert_async(file_content=content, filename=f"doc{i}.xml")
+        for i, content in enumerate(contents)
+    ))
+    
+    for i, result in enumerate(results):
+        assert result["markdown"] == f"Document number {i}"
+
+
+@pytest.mark.asyncio
+async def test_convert_many(conversion_service):
+    """Test converting several files in one call."""
+    items = [
+        {"file_content": b"First file", "filename": "first.txt"},
+        {"file_content": b"Second file", "filename": "second.xml"},
+        # Binary content no converter accepts
+        {"file_content": bytes(range(256)), "filename": "broken.bin"},
+    ]
+    
+    results = await conversion_service.convert_many_async(items, return_exceptions=True)
+    
+    assert results[0]["markdown"] == "First file"
+    assert results[1]["markdown"] == "Second file"
+    assert isinstance(results[2], ConversionError)
+    
+    with pytest.raises(ConversionError):
+        await conversion_service.convert_many_async(items)
+
+
+@pytest.mark.asyncio
+async def test_convert_large_file_via_shared_memory(conversion_service):
+    """Test converting a file large enough to go through shared memory."""
+    line = b"Large document line\n"
+    content = line * (SHARED_MEMORY_MIN_SIZE // len(line) + 1)
+    
+    result = await conversion_service.convert_async(
+        file_content=content,
+        filename="large.xml"
+    )
+    
+    assert result["markdown"] == content.decode().strip()
+
+
+def test_shared_memory_is_not_reported_as_leaked():
+    """Test that worker attachments leave no resource tracker warnings at exit."""
+    # The resource tracker only reports at interpreter exit, so run a
+    # service to completion in a fresh process
+    script = textwrap.dedent("""
+        import asyncio
+        from app.services.converter import ConversionService, SHARED_MEMORY_MIN_SIZE
+
+        async def main():
+            service = ConversionService(max_workers=2)
+            await service.initialize()
+            try:
+                for i in range(3):
+                    content = b"line %d\\n" % i * (SHARED_MEMORY_MIN_SIZE // 7 + 1)
+                    await service.convert_async(file_content=content, filename="large.xml")
+            finally:
+                await service.shutdown()
+
+        if __name__ == "__main__":
+            asyncio.run(main())
+    """)
+    completed = subprocess.run(
+        [sys.executable, "-c", script],
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        capture_output=True,
+        text=True,
+        timeout=60
+    )
+    
+    assert completed.returncode == 0, completed.stderr
+    assert "resource_tracker" not in completed.stderr
+
+
+def test_worker_logs_are_written():
+    """Test that records logged in a pool worker reach stdout."""
+    # Workers inherit the parent's queue handler; only a fresh process with
+    # queued logging set up shows whether their records get written
+    script = textwrap.dedent("""
+        import asyncio
+        import logging
+        from app.core.logging import setup_logging
+        from app.services.converter import ConversionService
+
+        async def main():
+            setup_logging("INFO")
+            service = ConversionService(max_workers=1, use_processes=True)
+            await service.initialize()
+            try:
+                warn = logging.getLogger("worker-test").warning
+                service.executor.submit(warn, "logged in worker").result()
+            finally:
+                await service.shutdown()
+
+        if __name__ == "__main__":
+            asyncio.run(main())
+    """)
+    completed = subprocess.run(
+        [sys.executable, "-c", script],
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        capture_output=True,
+        text=True,
+        timeout=60
+    )
+    
+    assert completed.returncode == 0, completed.stderr
+    assert "logged in worker" in completed.stdout
+
+
+@pytest.mark.asyncio
+async def test_convert_with_thread_executor():
+    """Test conversions when the service runs on threads instead of processes."""
+    service = ConversionService(max_workers=2, use_processes=False)
+    await service.initialize()
+    try:
+        # Batching and the fast-path thread pool only apply to process pools
+        assert service._batcher is None
+        assert service.thread_executor is None
+        result = await service.convert_async(
+            file_content=b"Converted on a thread",
+            filename="test.xml"
+        )
+        line = b"Large document line\n"
+        large = line * (SHARED_MEMORY_MIN_SIZE // len(line) + 1)
+        large_result = await service.convert_async(
+            file_content=memoryview(large),
+            filename="large.xml"
+        )
+    finally:
+        await service.shutdown()
+    
+    assert result["markdown"] == "Converted on a thread"
+    assert large_result["markdown"] == large.decode().strip()
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("filename", ["buffer.txt", "buffer.xml"])
+async def test_convert_buffer_content(conversion_service, filename):
+    """Test converting bytearray and memoryview content on thread and process paths."""
+    for content in (bytearray(b"Buffer content"), memoryview(b"Buffer content")):
+        conversion_service.result_cache.clear()
+        result = await conversion_service.convert_async(
+            file_content=content,
+            filename=filename
+        )
+        assert result["markdown"] == "Buffer content"
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("filename", ["mapped.txt", "mapped.xml"])
+async def test_convert_mapped_content(conversion_service, tmp_path, filename):
+    """Test converting a read-only mapping of a file on disk."""
+    file_path = tmp_path / filename
+    file_path.write_bytes(b"Mapped content")
+    
+    with open(file_path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        result = await conversion_service.convert_async(
+            file_content=mapped,
+            filename=filename
+        )
+    
+    assert result["markdown"] == "Mapped content"
+
+
+@pytest.mark.asyncio
+async def test_repeated_conversion_uses_cache(conversion_service):
+    """Test that converting identical content again is served from the cache."""
+    content = b"Cached content"
+    
+    first = await conversion_service.convert_async(file_content=content, filename="a.xml")
+    assert len(conversion_service.result_cache) == 1
+    
+    second = await conversion_service.convert_async(file_content=content, filename="b.xml")
+    assert second == first
+    assert len(conversion_service.result_cache) == 1
+
+
+def test_conversion_result_item_access():
+    """Test that results still support the item access of the old dict results."""
+    result = ConversionResult("# Doc", title="Doc")
+    
+    assert result["markdown"] == result.markdown == "# Doc"
+    assert result.get("title") == "Doc"
+    assert result.get("missing", 1) == 1
+    assert "metadata" in result and "missing" not in result
+    assert result.as_dict() == {"markdown": "# Doc", "title": "Doc", "metadata": {}}
+    with pytest.raises(KeyError):
+        result["missing"]
+
+
+def test_cached_result_metadata_is_not_shared():
+    """Test that changing a cached result's metadata doesn't change later hits."""
+    cache = ResultCache(max_entries=2, max_bytes=100)
+    cache.put(("a",), ConversionResult("a", metadata={"pages": [1]}))
+    
+    cache.get(("a",))["metadata"]["pages"].append(2)
+    cache.get(("a",)).get("metadata")["author"] = "x"
+    cache.get(("a",)).as_dict()["metadata"]["pages"].append(3)
+    
+    assert cache.get(("a",))["metadata"] == {"pages": [1]}
+
+
+def test_result_cache_eviction():
+    """Test LRU eviction by entry count and by cached markdown size."""
+    cache = ResultCache(max_entries=2, max_bytes=10)
+    cache.put(("a",), ConversionResult("aaaa"))
+    cache.put(("b",), ConversionResult("bbbb"))
+    cache.get(("a",))
+    cache.put(("c",), ConversionResult("cc"))
+    
+    # "b" was least recently used
+    assert cache.get(("b",)) is None
+    assert cache.get(("a",)) == ConversionResult("aaaa")
+    
+    cache.put(("d",), ConversionResult("dddddddd"))
+    assert len(cache) == 1
+    assert cache.total_bytes == 8
+    
+    # Results larger than the whole cache are not stored
+    cache.put(("e",), ConversionResult("e" * 11))
+    assert cache.get(("e",)) is None
+
+
+def test_thread_fast_path_selection():
+    """Test which files are converted on the thread fast path."""
+    assert _use_thread_fast_path(b"text", "notes.TXT", None)
+    assert _use_thread_fast_path(b"text", "upload", ".md")
+    assert not _use_thread_fast_path(b"text", "doc.pdf", None)
+    assert not _use_thread_fast_path(b"x" * THREAD_FAST_PATH_MAX_SIZE, "big.txt", None)
+
+
+def _make_pdf(text: str) -> bytes:
+    """Build a one-page PDF showing text in a standard font."""
+    stream = f"BT /F1 12 Tf 72 720 Td ({text}) Tj ET".encode()
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+        b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Contents 4 0 R "
+        b"/Resources << /Font << /F1 5 0 R >> >> >>",
+        b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream),
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    pdf = b"%PDF-1.4\n"
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(pdf))
+        pdf += b"%d 0 obj\n%s\nendobj\n" % (number, body)
+    xref = len(pdf)
+    pdf += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    pdf += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    pdf += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    return pdf
+
+
+@pytest.mark.asyncio
+async def test_convert_pdf_with_pdfium(conversion_service):
+    """Test PDF text extraction through the pypdfium2 backend."""
+    pytest.importorskip("pypdfium2")
+    
+    result = await conversion_service.convert_async(
+        file_content=_make_pdf("Hello PDF"),
+        filename="hello.pdf"
+    )
+    
+    assert result["markdown"] == "Hello PDF"
+
+
 def test_clean_markdown_excessive_newlines():
     """Test cleaning excessive newlines."""
     markdown = "Line 1\n\n\n\nLine 2\n\n\n\n\nLine 3"
@@ -67,11 +365,24 @@ def test_clean_markdown_header_spacing():
     assert cleaned == "Text before\n\n# Header\n\nText after"
 
 
+def test_clean_markdown_blank_lines_and_inline_hashes():
+    """Test whitespace-only lines collapse and mid-line '#' is not a header."""
+    markdown = "Para 1\n  \n\t\n \nx = 1  # note\ny = 2\n####### Not a header\nText"
+    cleaned = _clean_markdown(markdown)
+    assert cleaned == "Para 1\n\nx = 1  # note\ny = 2\n####### Not a header\nText"
+
+
 def test_clean_markdown_bullet_normalization():
     """Test bullet point normalization."""
     markdown = "• Item 1\n· Item 2\n- Item 3"
     cleaned = _clean_markdown(markdown)
     assert cleaned == "- Item 1\n- Item 2\n- Item 3"
+    
+    # The blank line separating a list from the paragraph above is kept
+    assert _clean_markdown("Intro\n\n• Item") == "Intro\n\n- Item"
+    
+    # Indented bullets are normalized; a bullet character mid-line is not
+    assert _clean_markdown("Intro\n  •  Item\nA • B") == "Intro\n- Item\nA • B"
 
 
 def test_clean_markdown_code_blocks():
@@ -101,6 +412,14 @@ def test_clean_markdown_empty_input():
     assert _clean_markdown(None) == ""
 
 
+def test_clean_markdown_by_extension():
+    """Test that plain text only loses trailing whitespace and other formats are cleaned."""
+    markdown = "Line 1  \n\n\n# Not spaced\n• Item\n```\n\ncode\n```"
+    assert _clean_markdown(markdown, ".txt") == "Line 1\n\n\n# Not spaced\n• Item\n```\n\ncode\n```"
+    assert _clean_markdown(markdown, ".pdf") == "Line 1\n\n# Not spaced\n\n- Item\n```\n\ncode\n```"
+    assert _clean_markdown(markdown, ".html") == _clean_markdown(markdown)
+
+
 @pytest.mark.asyncio
 async def test_get_available_workers(conversion_service):
     """Test getting available workers count."""
@@ -108,6 +427,32 @@ async def test_get_available_workers(conversion_service):
     assert workers == 2
 
 
+@pytest.mark.asyncio
+async def test_available_workers_tracks_inflight(conversion_service, monkeypatch):
+    """Test that only pool jobs reduce the available worker count, a batch once."""
+    executor = conversion_service.executor
+    submit = executor.submit
+    available_at_submit = []
+    
+    def recording_submit(*args, **kwargs):
+        available_at_submit.append(conversion_service.get_available_workers())
+        return submit(*args, **kwargs)
+    
+    monkeypatch.setattr(executor, "submit", recording_submit)
+    
+    # Three small .xml files share one batch; the .txt file takes the
+    # thread fast path and occupies no pool worker
+    items = [
+        {"file_content": f"In flight {i}".encode(), "filename": f"inflight{i}.xml"}
+        for i in range(3)
+    ]
+    items.append({"file_content": b"Fast path", "filename": "fast.txt"})
+    await conversion_service.convert_many_async(items)
+    
+    assert available_at_submit == [1]
+    assert conversion_service.get_available_workers() == 2
+
+
 @pytest.mark.asyncio
 async def test_conversion_error_handling(conversion_service):
     """Test error handling in conversion."""